@@ -0,0 +1,206 @@
+import argparse
+import json
+import math
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+import dataset
+import metrics
+
+# Read-only JSON API over the dashboard's numbers.
+#
+#   GET /api/overview                 headline metrics per retailer
+#   GET /api/distributions/price      share of products per price range
+#   GET /api/distributions/rating     share of products per rating range
+#   GET /api/brands                   brands Credo shares with a competitor
+#   GET /api/brands/<brand>           per-brand comparison
+#
+# Every response carries an ETag and Last-Modified derived from the data
+# version, so clients that send If-None-Match / If-Modified-Since get a 304
+# until the CSVs change (checked at most once per REFRESH_INTERVAL). The
+# dashboard starts it on its own DataStore; run `python api.py` to serve
+# standalone.
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8502
+
+# Check the CSVs for changes at most this often (seconds); a refresh stats
+# every file under the store lock, which would otherwise run per request
+REFRESH_INTERVAL = 1.0
+
+# Pending-connection backlog; the socketserver default of 5 overflows under
+# modest concurrency and clients stall on SYN retries
+REQUEST_QUEUE_SIZE = 128
+
+
+def _jsonable(value):
+    # NaN/inf aren't valid JSON; report them as null
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, dict):
+        return {k: _jsonable(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_jsonable(v) for v in value]
+    return value
+
+
+def _records(dist, bin_column):
+    return [
+        {'source': source, 'bin': str(bin_label), 'count': int(count), 'percent': float(percent)}
+        for source, bin_label, count, percent in zip(dist['source'], dist[bin_column], dist['count'], dist['percent'])
+    ]
+
+
+class MetricsAPI:
+    def __init__(self, store, refresh_interval=REFRESH_INTERVAL):
+        self.store = store
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._refreshed_at = None
+        self._version = None
+        self._bodies = {}
+
+    def _refresh(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._refreshed_at is not None and now - self._refreshed_at < self.refresh_interval:
+                return
+            self._refreshed_at = now
+        self.store.refresh()
+
+    def _build(self, snapshot, path):
+        df_combined = snapshot.df_combined
+        parts = [unquote(p) for p in path.strip('/').split('/')]
+
+        if parts == ['api', 'overview']:
+            payload = {name: metrics.source_overview(df) for name, df in snapshot.frames.items()}
+        elif parts == ['api', 'distributions', 'price']:
+            payload = _records(metrics.price_distribution(df_combined, metrics.price_bins(df_combined)), 'price_bin')
+        elif parts == ['api', 'distributions', 'rating']:
+            payload = _records(metrics.rating_distribution(df_combined), 'rating_bin')
+        elif parts == ['api', 'brands']:
+            payload = metrics.common_brands(snapshot.frames)
+        elif len(parts) == 3 and parts[:2] == ['api', 'brands']:
+            brand = parts[2]
+            if brand not in metrics.common_brands(snapshot.frames):
+                return None
+            payload = {
+                'brand': brand,
+                'metrics': metrics.brand_metrics(df_combined, brand),
+                'price_distribution': _records(
+                    metrics.brand_price_distribution(df_combined, brand, metrics.price_bins(df_combined)), 'price_bin'),
+            }
+        else:
+            return None
+
+        body = {'version': snapshot.version, 'data': payload}
+        return json.dumps(_jsonable(body)).encode('utf-8')
+
+    def get(self, path):
+        # Returns (snapshot, body bytes or None if not found); bodies are built
+        # once per data version, from the same snapshot that supplies the ETag
+        self._refresh()
+        snapshot = self.store.snapshot
+        with self._lock:
+            if snapshot.version != self._version:
+                self._version = snapshot.version
+                self._bodies = {}
+            if path in self._bodies:
+                return snapshot, self._bodies[path]
+        body = self._build(snapshot, path)
+        # Unknown paths aren't cached, so random URLs can't grow the cache
+        if body is not None:
+            with self._lock:
+                if snapshot.version == self._version:
+                    self._bodies[path] = body
+        return snapshot, body
+
+
+def _not_modified(headers, etag, modified_at):
+    if_none_match = headers.get('If-None-Match')
+    if if_none_match is not None:
+        tags = [t.strip() for t in if_none_match.split(',')]
+        return '*' in tags or etag in tags or 'W/' + etag in tags
+    if_modified_since = headers.get('If-Modified-Since')
+    if if_modified_since:
+        try:
+            return int(modified_at) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def make_handler(api):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = urlparse(self.path).path
+            snapshot, body = api.get(path)
+            if body is None:
+                self._send(404, json.dumps({'error': f'not found: {path}'}).encode('utf-8'))
+                return
+
+            etag = f'"{snapshot.version}"'
+            modified_at = snapshot.modified_at
+            headers = {
+                'ETag': etag,
+                'Last-Modified': formatdate(modified_at, usegmt=True),
+                'Cache-Control': 'no-cache',
+            }
+            if _not_modified(self.headers, etag, modified_at):
+                self._send(304, None, headers)
+            else:
+                self._send(200, body, headers)
+
+        def _send(self, status, body, headers=None):
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            if body is not None:
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if body is not None:
+                self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Keep the Streamlit console readable
+            pass
+
+    return Handler
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = REQUEST_QUEUE_SIZE
+
+
+def make_server(store, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    return _Server((host, port), make_handler(MetricsAPI(store)))
+
+
+def serve_in_background(store, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    # Returns the server, or None if the port is taken (e.g. another
+    # Streamlit process on this machine already serves the API)
+    try:
+        server = make_server(store, host, port)
+    except OSError as e:
+        print(f'Metrics API not started on {host}:{port}: {e}')
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve the dashboard metrics as a read-only JSON API.')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    server = make_server(dataset.DataStore(), args.host, args.port)
+    print(f'Serving metrics API on http://{args.host}:{args.port}/api/overview')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
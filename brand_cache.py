@@ -0,0 +1,211 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import dataset
+import metrics
+
+# Persistent on-disk cache of the "Select a Brand to Compare" drilldowns.
+# Entries live under CACHE_DIR/<data version>/ so every Streamlit worker (and
+# every server restart) shares them, and a data change simply starts a new
+# directory. Warm it up with `python brand_cache.py` or let the dashboard
+# kick it off in the background (debounced) on startup and after data changes.
+#
+# The dashboard always runs the warm-up as `python brand_cache.py` in a child
+# process rather than starting the pool itself: inside Streamlit, __main__ is
+# tob.py, so spawned pool workers would re-run the whole dashboard.
+
+CACHE_DIR = os.path.join('.cache', 'brands')
+
+# Bumped when entry contents change, so entries cached by older code rebuild
+ENTRY_FORMAT = 2
+
+
+def _entry_path(version, brand):
+    name = hashlib.sha1(brand.encode('utf-8')).hexdigest()
+    return os.path.join(CACHE_DIR, version, name + '.json')
+
+
+def read(version, brand):
+    try:
+        with open(_entry_path(version, brand), encoding='utf-8') as f:
+            entry = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    return entry if entry.get('format') == ENTRY_FORMAT else None
+
+
+def write(version, brand, entry):
+    path = _entry_path(version, brand)
+    # A warm-up in another process may prune this version's directory under
+    # us; recreate it once, then give up (the entry is only a cache)
+    for attempt in range(2):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file first so readers never see a half-written entry
+            with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(path), suffix='.tmp',
+                                             delete=False, encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(f.name, path)
+            return True
+        except FileNotFoundError:
+            continue
+    return False
+
+
+def build_entry(df_combined, brand, bins):
+    brand_metrics, fig = metrics.brand_comparison(df_combined, brand, bins)
+    return {'format': ENTRY_FORMAT, 'brand': brand, 'metrics': brand_metrics, 'figure': fig.to_json()}
+
+
+def get(version, df_combined, brand, bins):
+    entry = read(version, brand)
+    if entry is None:
+        entry = build_entry(df_combined, brand, bins)
+        write(version, brand, entry)
+    return entry
+
+
+# Each pool worker loads the dataset once, then builds its share of brands
+_worker_data = None
+
+
+def _init_worker():
+    global _worker_data
+    version = dataset.data_version()
+    _, df_combined = dataset.load_data()
+    _worker_data = (version, df_combined, metrics.price_bins(df_combined))
+
+
+def _warm_brands(version, brands):
+    worker_version, df_combined, bins = _worker_data
+    if worker_version != version:
+        # Source files changed after warm-up started; don't file new data under the old version
+        return 0
+    for brand in brands:
+        write(version, brand, build_entry(df_combined, brand, bins))
+    return len(brands)
+
+
+# Seconds a version directory must go unwritten before a warm-up deletes it.
+# Dashboards key the cache on their snapshot's version, which can lag the files
+# (deferred refresh, a half-written row, another server process), so other
+# versions may still be in use for a while.
+PRUNE_AGE = 24 * 60 * 60
+
+
+def _prune(version, max_age=PRUNE_AGE):
+    try:
+        names = os.listdir(CACHE_DIR)
+    except FileNotFoundError:
+        return
+    cutoff = time.time() - max_age
+    for name in names:
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            stale = name != version and os.path.getmtime(path) < cutoff
+        except OSError:
+            continue
+        if stale:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def warm_up(workers=None):
+    version = dataset.data_version()
+    frames, _ = dataset.load_data()
+    brands = [b for b in metrics.common_brands(frames)
+              if read(version, b) is None]
+
+    built = 0
+    if brands:
+        workers = max(1, min(workers or os.cpu_count() or 1, len(brands)))
+        chunks = [brands[i::workers] for i in range(workers)]
+        # Only ever started from the CLI below, where __main__ is this module
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker) as pool:
+            built = sum(pool.map(_warm_brands, [version] * len(chunks), chunks))
+
+    _prune(version)
+    return version, built
+
+
+def _run_cli(workers):
+    command = [sys.executable, os.path.abspath(__file__)]
+    if workers:
+        command += ['--workers', str(workers)]
+    return subprocess.Popen(command).wait()
+
+
+class _BackgroundWarmer:
+    # One warm-up thread per process, each run a `python brand_cache.py` child.
+    # Requests that arrive while a warm-up is waiting or running collapse into a
+    # single follow-up run, started once the data has been quiet for `debounce`
+    # seconds; the first run starts at once.
+
+    def __init__(self, workers, debounce):
+        self.workers = workers
+        self.debounce = debounce
+        self._cond = threading.Condition()
+        self._requested_at = None
+        self._first = True
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def request(self):
+        with self._cond:
+            self._requested_at = time.monotonic()
+            if self._first:
+                self._requested_at -= self.debounce
+                self._first = False
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._requested_at is None:
+                    self._cond.wait()
+                while True:
+                    remaining = self._requested_at + self.debounce - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                self._requested_at = None
+            try:
+                returncode = _run_cli(self.workers)
+            except OSError as e:
+                print(f'Brand cache warm-up failed: {e}')
+                continue
+            if returncode != 0:
+                print(f'Brand cache warm-up failed: exit status {returncode}')
+
+
+# Seconds without data changes before a new warm-up, so trickle appends don't
+# each rebuild every brand
+WARM_UP_DEBOUNCE = 120
+
+_warmer = None
+_warmer_lock = threading.Lock()
+
+
+def request_background_warm_up(workers=None, debounce=WARM_UP_DEBOUNCE):
+    global _warmer
+    with _warmer_lock:
+        if _warmer is None:
+            _warmer = _BackgroundWarmer(workers, debounce)
+    _warmer.request()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Precompute brand drilldowns into the on-disk cache.')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    args = parser.parse_args()
+    version, built = warm_up(args.workers)
+    print(f'Brand cache {version}: built {built} entries in {os.path.join(CACHE_DIR, version)}')
@@ -0,0 +1,397 @@
+import functools
+import hashlib
+import importlib.util
+import io
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+# Plain (Streamlit-free) data loading, shared by the dashboard and by the
+# offline jobs that run in their own processes.
+
+logger = logging.getLogger(__name__)
+
+REVIEWS_PATH = 'credo_reviews.csv'
+
+# The retailer whose catalog drives the showcase, reviews and brand comparison
+HOME_RETAILER = 'Credo'
+
+# Bytes hashed at the start of a file and just before the watermark to tell
+# an append (both unchanged) from a rewrite
+FINGERPRINT_BYTES = 4096
+
+
+def _version_of(stats):
+    digest = hashlib.sha1()
+    for path, stat in stats:
+        if stat is None:
+            digest.update(f'{path}:missing;'.encode())
+        else:
+            digest.update(f'{path}:{stat.st_size}:{stat.st_mtime_ns};'.encode())
+    return digest.hexdigest()[:16]
+
+
+def _stat(path):
+    try:
+        return os.stat(path)
+    except FileNotFoundError:
+        return None
+
+
+def data_version(paths=None):
+    # Fingerprint of the retailer files; any rewrite or append changes it, so it
+    # can key caches that are shared between processes
+    if paths is None:
+        paths = [adapter.path for adapter in RETAILERS.values()]
+    return _version_of([(path, _stat(path)) for path in paths])
+
+
+# The pyarrow engine parses multi-threaded and releases the GIL, so sources
+# loading side by side actually overlap. It rejects newlines inside quoted
+# fields, so files that have them (review bodies) use the C parser instead.
+PYARROW_ENGINE = 'pyarrow' if importlib.util.find_spec('pyarrow') is not None else None
+
+
+def read_csv(path_or_bytes, engine=None):
+    def source():
+        return io.BytesIO(path_or_bytes) if isinstance(path_or_bytes, bytes) else path_or_bytes
+
+    if engine == 'pyarrow' and PYARROW_ENGINE is not None:
+        try:
+            return pd.read_csv(source(), engine='pyarrow')
+        except ValueError:
+            # Unexpected quoted newline in a product file; parse it the slow way
+            pass
+    return pd.read_csv(source())
+
+
+# Define price extraction function
+def extract_price(price_str):
+    if pd.isnull(price_str):
+        return None
+    match = re.findall(r'[\d\.]+', str(price_str))
+    if match:
+        return float(match[0])
+    else:
+        return None
+
+
+class RetailerAdapter:
+    # One retailer's product CSV: where it lives, how its columns map onto the
+    # shared schema (product_id, product_name, brand_name, price, rating,
+    # reviews), the chart colour, and an optional retailer-specific cleaning
+    # step run after the common rules.
+    # `ingredients` is (csv path, id column, ingredients column) for similar.py;
+    # `engine` picks the CSV parser (None for the pandas C parser).
+
+    def __init__(self, name, path, columns, color, clean=None, ingredients=None, engine=PYARROW_ENGINE):
+        self.name = name
+        self.path = path
+        self.columns = columns
+        self.color = color
+        self.extra_clean = clean
+        self.ingredients = ingredients
+        self.engine = engine
+
+    def clean(self, df, categories=None):
+        # `categories` is the retailer list to code `source` against; callers
+        # that combine frames must pass the same list to every clean
+        df = df.rename(columns=self.columns)
+        df['price'] = df['price'].apply(extract_price)
+        df = df.dropna(subset=['price'])
+        df['rating'] = pd.to_numeric(df['rating'], errors='coerce')
+        df['reviews'] = pd.to_numeric(df['reviews'], errors='coerce')
+        if self.extra_clean is not None:
+            df = self.extra_clean(df)
+        # Integer-coded; every retailer shares the same categories so concat keeps the codes
+        if categories is None:
+            categories = list(RETAILERS)
+        df['source'] = pd.Categorical([self.name] * len(df), categories=categories)
+        return df
+
+    def load(self, categories=None):
+        return self.clean(read_csv(self.path, self.engine), categories)
+
+
+# Retailers in display order. Adding a competitor is one register_retailer()
+# call; loading, charts and colours pick it up from here.
+RETAILERS = {}
+
+
+def register_retailer(adapter):
+    RETAILERS[adapter.name] = adapter
+    return adapter
+
+
+register_retailer(RetailerAdapter(
+    'Credo', 'credo_finaldata.csv',
+    columns={'id': 'product_id', 'name': 'product_name', 'review_count': 'reviews'},
+    color='#d8e6f5',
+    ingredients=('credoproduct_info.csv', 'id', 'all_ingredients'),
+))
+register_retailer(RetailerAdapter(
+    'Sephora', 'sephoraproduct_info.csv',
+    columns={'price_usd': 'price'},
+    color='#f7d7d9',
+    ingredients=('sephoraproduct_info.csv', 'product_id', 'ingredients'),
+))
+
+
+def clean_reviews(df_reviews):
+    df_reviews = df_reviews.copy()
+    df_reviews['rating'] = pd.to_numeric(df_reviews['rating'], errors='coerce')
+    for field in ['title', 'body']:
+        df_reviews[field] = df_reviews[field].fillna('').astype(str)
+    return df_reviews
+
+
+def combine(frames):
+    return pd.concat(list(frames.values()), ignore_index=True)
+
+
+def load_data():
+    # Returns ({retailer: frame}, combined frame); retailers load concurrently
+    adapters = dict(RETAILERS)
+    categories = list(adapters)
+    with ThreadPoolExecutor(max_workers=max(1, len(adapters))) as pool:
+        frames = dict(zip(adapters, pool.map(lambda a: a.load(categories), adapters.values())))
+    return frames, combine(frames)
+
+
+def load_reviews():
+    return clean_reviews(read_csv(REVIEWS_PATH))
+
+
+def _fingerprint(f, offset):
+    digest = hashlib.sha1()
+    f.seek(0)
+    digest.update(f.read(min(offset, FINGERPRINT_BYTES)))
+    start = max(0, offset - FINGERPRINT_BYTES)
+    f.seek(start)
+    digest.update(f.read(offset - start))
+    return digest.digest()
+
+
+def _last_record_end(data):
+    # Offset just past the last newline that ends a whole CSV record, or 0.
+    # Escaped quotes are doubled, so a newline sits outside any quoted field
+    # exactly when an even number of quotes precede it (data must start on a
+    # record boundary).
+    quotes = data.count(b'"')
+    end = len(data)
+    while True:
+        newline = data.rfind(b'\n', 0, end)
+        if newline < 0:
+            return 0
+        if (quotes - data.count(b'"', newline + 1)) % 2 == 0:
+            return newline + 1
+        end = newline
+
+
+class _Tail:
+    # Watermark for one append-only CSV: how far it has been parsed and what
+    # the bytes up to there looked like.
+    #
+    # Appends are told from rewrites by the size, the mtime and a hash of the
+    # first and last FINGERPRINT_BYTES before the watermark. An edit elsewhere
+    # in the middle of a file that also grows it can slip past that check.
+
+    def __init__(self, path, clean, engine=None):
+        self.path = path
+        self.clean = clean
+        self.engine = engine
+        self.offset = 0
+        # Start of the last record when the file didn't end with a newline at
+        # the last full read; that record is re-read if the writer extends it
+        self.record_start = 0
+        # Cleaned rows the unterminated last record contributed (0 or 1)
+        self.record_rows = 0
+        self.stat = None
+        self.columns = None
+        self.fingerprint = None
+
+    def full_read(self):
+        # Parse the whole file. State is only updated once parsing succeeded,
+        # so a failed reload leaves the previous watermark in place.
+        stat = os.stat(self.path)
+        with open(self.path, 'rb') as f:
+            data = f.read(stat.st_size)
+            fingerprint = _fingerprint(f, len(data))
+        raw = read_csv(data, self.engine)
+        df = self.clean(raw)
+
+        # A file at rest ends with a whole record even without a trailing newline
+        record_start = len(data)
+        record_rows = 0
+        if data and not data.endswith(b'\n'):
+            record_start = _last_record_end(data)
+            record_rows = int(len(raw) > 0 and raw.index[-1] in df.index)
+
+        self.offset = len(data)
+        self.record_start = record_start
+        self.record_rows = record_rows
+        self.fingerprint = fingerprint
+        self.stat = stat
+        self.columns = list(raw.columns)
+        return df
+
+    def read_appended(self):
+        # Returns (cleaned new rows or None, rows to drop from the end of the
+        # cached frame first, needs full reload)
+        stat = _stat(self.path)
+        if stat is None:
+            raise FileNotFoundError(self.path)
+        if (stat.st_size, stat.st_mtime_ns) == (self.stat.st_size, self.stat.st_mtime_ns):
+            return None, 0, False
+        if stat.st_size <= self.stat.st_size or stat.st_size < self.offset:
+            # Touched without growing, or truncated: edited in place
+            return None, 0, True
+
+        with open(self.path, 'rb') as f:
+            if _fingerprint(f, self.offset) != self.fingerprint:
+                return None, 0, True
+            start, drop = self.offset, 0
+            if self.record_start < self.offset:
+                # The last record had no newline. If the append starts with one,
+                # that record was complete; otherwise re-read it from its start.
+                f.seek(self.offset)
+                if f.read(1) in (b'\n', b'\r'):
+                    start = self.offset
+                else:
+                    start, drop = self.record_start, self.record_rows
+            f.seek(start)
+            data = f.read(stat.st_size - start)
+
+        # Only whole records; a partially written row waits for its newline
+        end = _last_record_end(data)
+        if end == 0:
+            self.stat = stat
+            return None, 0, False
+        if not data[:end].strip():
+            # Just the newline that terminates the record already parsed
+            self._advance(stat, start + end)
+            return None, 0, False
+        try:
+            df = pd.read_csv(io.BytesIO(data[:end]), header=None, names=self.columns)
+        except ValueError:
+            return None, 0, True
+
+        self._advance(stat, start + end)
+        return self.clean(df), drop, False
+
+    def _advance(self, stat, offset):
+        with open(self.path, 'rb') as f:
+            self.fingerprint = _fingerprint(f, offset)
+        self.offset = self.record_start = offset
+        self.record_rows = 0
+        self.stat = stat
+
+
+_REVIEWS = 'reviews'
+
+
+class Snapshot:
+    # One consistent view of the data at a given version. Treat the frames as
+    # read-only: they are shared with other sessions and the API threads.
+
+    def __init__(self, frames, df_reviews, version, reviews_version, modified_at):
+        self.frames = frames
+        self.df_credo = frames[HOME_RETAILER]
+        self.df_combined = combine(frames)
+        self.df_reviews = df_reviews
+        self.version = version
+        self.reviews_version = reviews_version
+        self.modified_at = modified_at
+
+
+class DataStore:
+    # Cached frames that can pick up rows appended to the source CSVs without
+    # reparsing them. Each frame group carries its own version, so caches keyed
+    # on product data survive new reviews and vice versa.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Retailers are fixed when the store is created, so appended chunks are
+        # coded against the same categories as the cached frames
+        self._retailers = list(RETAILERS)
+        self._tails = {
+            name: _Tail(adapter.path, functools.partial(adapter.clean, categories=self._retailers), adapter.engine)
+            for name, adapter in RETAILERS.items()
+        }
+        self._tails[_REVIEWS] = _Tail(REVIEWS_PATH, clean_reviews)
+        with ThreadPoolExecutor(max_workers=len(self._tails)) as pool:
+            self._frames = dict(zip(self._tails, pool.map(_Tail.full_read, self._tails.values())))
+        self._publish()
+
+    def _publish(self):
+        # Swap in a new snapshot rather than mutating, so readers holding the
+        # old one keep a consistent view
+        frames = {name: self._frames[name] for name in self._retailers}
+        product_tails = [self._tails[name] for name in self._retailers]
+        self.snapshot = Snapshot(
+            frames,
+            self._frames[_REVIEWS],
+            version=_version_of([(t.path, t.stat) for t in product_tails]),
+            reviews_version=_version_of([(REVIEWS_PATH, self._tails[_REVIEWS].stat)]),
+            modified_at=max(t.stat.st_mtime for t in product_tails),
+        )
+
+    # Shortcuts to the current snapshot; take `store.snapshot` once instead
+    # when several values must agree with each other
+    @property
+    def frames(self):
+        return self.snapshot.frames
+
+    @property
+    def df_credo(self):
+        return self.snapshot.df_credo
+
+    @property
+    def df_combined(self):
+        return self.snapshot.df_combined
+
+    @property
+    def df_reviews(self):
+        return self.snapshot.df_reviews
+
+    @property
+    def version(self):
+        return self.snapshot.version
+
+    @property
+    def reviews_version(self):
+        return self.snapshot.reviews_version
+
+    @property
+    def modified_at(self):
+        return self.snapshot.modified_at
+
+    def refresh(self):
+        # Fold appended rows into the frames; reload a source only if it was rewritten.
+        # Returns the names of the sources that changed.
+        with self._lock:
+            changed = []
+            for name, tail in self._tails.items():
+                try:
+                    new_rows, drop, rewritten = tail.read_appended()
+                    if rewritten:
+                        frame = tail.full_read()
+                    elif new_rows is not None:
+                        frame = self._frames[name]
+                        frame = pd.concat([frame.iloc[:len(frame) - drop], new_rows], ignore_index=True)
+                    else:
+                        continue
+                except (OSError, ValueError) as e:
+                    # Most likely caught mid-write (e.g. inside a quoted multi-line
+                    # review); keep the previous frame and watermark, retry next time
+                    logger.warning('Refresh of %s deferred: %s', tail.path, e)
+                    continue
+                self._frames[name] = frame
+                changed.append(name)
+            if changed:
+                self._publish()
+            return changed
@@ -0,0 +1,100 @@
+import argparse
+import http.client
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from urllib.parse import quote
+
+# Load test for the metrics API (api.py). Start the dashboard or
+# `python api.py` first, then e.g.:
+#
+#   python loadtest.py --requests 2000 --concurrency 16
+#   python loadtest.py --conditional   # replay ETags, expect 304s
+
+PATHS = [
+    '/api/overview',
+    '/api/distributions/price',
+    '/api/distributions/rating',
+    '/api/brands',
+]
+
+# Status bucket for requests that never got an HTTP response
+CONNECTION_ERROR = 'error'
+
+
+def fetch(url, etag=None):
+    request = urllib.request.Request(url)
+    if etag:
+        request.add_header('If-None-Match', etag)
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            response.read()
+            status, etag = response.status, response.headers.get('ETag')
+    except urllib.error.HTTPError as e:
+        # urllib raises for 304 as well as real errors
+        status, etag = e.code, e.headers.get('ETag')
+    except (OSError, http.client.HTTPException):
+        # Refused, reset or timed out (URLError is an OSError): no HTTP status
+        status, etag = CONNECTION_ERROR, None
+    return status, etag, time.perf_counter() - start
+
+
+def run(base_url, paths, total, concurrency, conditional):
+    etags = {}
+    if conditional:
+        for path in paths:
+            etags[path] = fetch(base_url + path)[1]
+
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+    counter = iter(range(total))
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            path = paths[i % len(paths)]
+            status, _, elapsed = fetch(base_url + path, etags.get(path))
+            with lock:
+                if status != CONNECTION_ERROR:
+                    latencies.append(elapsed)
+                statuses[status] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    # Rates and latencies cover completed requests only
+    latencies.sort()
+    ms = [x * 1000 for x in latencies]
+    print(f'{total} requests ({len(ms)} completed), concurrency {concurrency}, {wall:.2f}s wall, '
+          f'{len(ms) / wall:.0f} req/s')
+    print('status: ' + ', '.join(f'{code}={count}' for code, count in sorted(statuses.items(), key=lambda item: str(item[0]))))
+    if not ms:
+        print('latency ms: no requests completed')
+        return
+    print(f'latency ms: mean {statistics.mean(ms):.2f}  p50 {ms[len(ms) // 2]:.2f}  '
+          f'p95 {ms[max(int(len(ms) * 0.95) - 1, 0)]:.2f}  max {ms[-1]:.2f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test the metrics API on localhost.')
+    parser.add_argument('--url', default='http://127.0.0.1:8502')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--brand', action='append', default=[], help='also hit /api/brands/<brand>')
+    parser.add_argument('--conditional', action='store_true', help='send If-None-Match with each request')
+    args = parser.parse_args()
+    paths = PATHS + [f'/api/brands/{quote(brand)}' for brand in args.brand]
+    run(args.url.rstrip('/'), paths, args.requests, args.concurrency, args.conditional)
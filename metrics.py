@@ -0,0 +1,103 @@
+import pandas as pd
+import plotly.express as px
+
+import dataset
+
+# Metric and figure builders shared by the dashboard, the cache warm-up and the JSON API
+
+
+PRICE_LABELS = ['Budget ($0-25)', 'Low Price ($25-50)', 'Mid Price ($50-100)', 'High Price ($100-200)', 'Luxury ($200+)']
+RATING_BINS = [0, 2, 3, 4, 5]
+RATING_LABELS = ['0-2', '2-3', '3-4', '4-5']
+
+
+def source_colors():
+    return {name: adapter.color for name, adapter in dataset.RETAILERS.items()}
+
+
+def price_bins(df_combined):
+    return [0, 25, 50, 100, 200, df_combined['price'].max()]
+
+
+def common_brands(frames, home=dataset.HOME_RETAILER):
+    # Brands the home retailer shares with at least one competitor
+    competitor_brands = set()
+    for name, df in frames.items():
+        if name != home:
+            competitor_brands.update(df['brand_name'].unique())
+    common = set(frames[home]['brand_name'].unique()).intersection(competitor_brands)
+    return sorted(list(common))
+
+
+def source_overview(df):
+    # Headline numbers for one retailer
+    return {
+        'num_brands': int(df['brand_name'].nunique()),
+        'num_products': int(df['product_id'].nunique()),
+        'avg_price': float(df['price'].mean()),
+        'median_price': float(df['price'].median()),
+        'min_price': float(df['price'].min()),
+        'max_price': float(df['price'].max()),
+        'avg_rating': float(df['rating'].mean()),
+        'median_rating': float(df['rating'].median()),
+        'avg_reviews': float(df['reviews'].mean()),
+    }
+
+
+def distribution(df, bin_column):
+    # Share of each source's products falling in each bin
+    dist = df.groupby(['source', bin_column], observed=False).size().reset_index(name='count')
+    total_counts = dist.groupby('source', observed=False)['count'].transform('sum')
+    dist['percent'] = dist['count'] / total_counts * 100
+    return dist
+
+
+def price_distribution(df_combined, bins):
+    df = df_combined[['source', 'price']].copy()
+    df['price_bin'] = pd.cut(df['price'], bins=bins, labels=PRICE_LABELS, include_lowest=True)
+    return distribution(df, 'price_bin')
+
+
+def rating_distribution(df_combined):
+    df = df_combined[['source', 'rating']].copy()
+    df['rating_bin'] = pd.cut(df['rating'], bins=RATING_BINS, labels=RATING_LABELS, include_lowest=True)
+    return distribution(df, 'rating_bin')
+
+
+def brand_metrics(df_combined, brand):
+    # Average price and rating per source for one brand, for sources that carry it
+    df_brand = df_combined[df_combined['brand_name'] == brand]
+    result = {}
+    for source in dataset.RETAILERS:
+        df_source = df_brand[df_brand['source'] == source]
+        if df_source.empty:
+            continue
+        result[source] = {
+            'avg_price': float(df_source['price'].mean()),
+            'avg_rating': float(df_source['rating'].mean()),
+        }
+    return result
+
+
+def brand_price_distribution(df_combined, brand, bins):
+    # Price distribution for the brand, using the same price ranges
+    return price_distribution(df_combined[df_combined['brand_name'] == brand], bins)
+
+
+def brand_comparison(df_combined, brand, bins):
+    brand_price_distribution_df = brand_price_distribution(df_combined, brand, bins)
+
+    fig_brand_price_bar = px.bar(
+        brand_price_distribution_df,
+        x='price_bin',
+        y='percent',
+        color='source',
+        color_discrete_map=source_colors(),
+        barmode='group',
+        text=brand_price_distribution_df['percent'].round(1),
+        title=f'Price Distribution for {brand}',
+        labels={'price_bin': 'Price Range', 'percent': 'Percentage (%)'}
+    )
+    fig_brand_price_bar.update_traces(textposition='outside')
+
+    return brand_metrics(df_combined, brand), fig_brand_price_bar
@@ -0,0 +1,232 @@
+import os
+import re
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+# BM25 full-text search over review titles and bodies.
+#
+# The inverted index is stored CSR-style: the postings of term t are
+# doc_ids[term_offsets[t]:term_offsets[t + 1]] with matching term_freqs.
+# It is built once per reviews data version and persisted under CACHE_DIR.
+# The dashboard goes through BackgroundIndex, which keeps answering from the
+# previous version's index while the next one builds.
+
+CACHE_DIR = os.path.join('.cache', 'reviews')
+
+K1 = 1.2
+B = 0.75
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(str(text).lower())
+
+
+class ReviewIndex:
+    def __init__(self, vocabulary, term_offsets, doc_ids, term_freqs, doc_lengths,
+                 product_ids, brand_codes, brands):
+        self.vocabulary = vocabulary
+        self.term_offsets = term_offsets
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.doc_lengths = doc_lengths
+        # Per review row, for restricting a query to a brand or product
+        self.product_ids = product_ids
+        self.brand_codes = brand_codes
+        self.brands = brands
+        self._term_id = {term: i for i, term in enumerate(vocabulary)}
+        self._brand_code = {brand: i for i, brand in enumerate(brands)}
+        self._avg_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Unique temp name: another server process may be saving the same version
+        with tempfile.NamedTemporaryFile('wb', dir=os.path.dirname(path), suffix='.tmp',
+                                         delete=False) as f:
+            np.savez(
+                f,
+                vocabulary=self.vocabulary,
+                term_offsets=self.term_offsets,
+                doc_ids=self.doc_ids,
+                term_freqs=self.term_freqs,
+                doc_lengths=self.doc_lengths,
+                product_ids=self.product_ids,
+                brand_codes=self.brand_codes,
+                brands=self.brands,
+            )
+        os.replace(f.name, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['vocabulary'], data['term_offsets'], data['doc_ids'],
+                       data['term_freqs'], data['doc_lengths'], data['product_ids'],
+                       data['brand_codes'], data['brands'])
+
+    def search(self, query, brand=None, product_id=None, top_n=20):
+        # Returns (review row positions, BM25 scores), best first
+        empty = (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32))
+        brand_code = None
+        if brand is not None:
+            brand_code = self._brand_code.get(brand)
+            if brand_code is None:
+                return empty
+
+        n_docs = len(self)
+        scores = np.zeros(n_docs, dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self._term_id.get(term)
+            if term_id is None:
+                continue
+            lo, hi = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            docs = self.doc_ids[lo:hi]
+            tf = self.term_freqs[lo:hi].astype(np.float32)
+            # Filter postings before scoring so restricted queries touch fewer docs
+            if brand_code is not None:
+                keep = self.brand_codes[docs] == brand_code
+                docs, tf = docs[keep], tf[keep]
+            if product_id is not None:
+                keep = self.product_ids[docs] == int(product_id)
+                docs, tf = docs[keep], tf[keep]
+            if len(docs) == 0:
+                continue
+            df = hi - lo
+            idf = np.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+            norm = K1 * (1.0 - B + B * self.doc_lengths[docs] / self._avg_length)
+            # Postings hold each doc at most once per term, so fancy-index += is safe
+            scores[docs] += idf * tf * (K1 + 1.0) / (tf + norm)
+
+        hits = np.flatnonzero(scores)
+        if len(hits) == 0:
+            return empty
+        if len(hits) > top_n:
+            hits = hits[np.argpartition(-scores[hits], top_n - 1)[:top_n]]
+        hits = hits[np.argsort(-scores[hits], kind='stable')]
+        return hits.astype(np.int32), scores[hits]
+
+
+def build_index(df_reviews):
+    texts = (df_reviews['title'].fillna('').astype(str) + ' ' +
+             df_reviews['body'].fillna('').astype(str))
+
+    term_id = {}
+    token_terms = []
+    doc_lengths = np.zeros(len(texts), dtype=np.int32)
+    for doc, text in enumerate(texts):
+        tokens = tokenize(text)
+        doc_lengths[doc] = len(tokens)
+        token_terms.append(np.fromiter((term_id.setdefault(t, len(term_id)) for t in tokens),
+                                       dtype=np.int64, count=len(tokens)))
+
+    # Renumber terms alphabetically so the vocabulary can be stored as a plain sorted array
+    vocabulary = np.array(sorted(term_id), dtype='U')
+    remap = np.empty(len(term_id), dtype=np.int64)
+    remap[[term_id[t] for t in vocabulary]] = np.arange(len(vocabulary))
+
+    n_docs = len(texts)
+    terms = remap[np.concatenate(token_terms)] if token_terms and doc_lengths.sum() else np.empty(0, dtype=np.int64)
+    docs = np.repeat(np.arange(n_docs, dtype=np.int64), doc_lengths)
+
+    # One posting per (term, doc) pair, sorted by term then doc
+    pairs, term_freqs = np.unique(terms * max(n_docs, 1) + docs, return_counts=True)
+    posting_terms = pairs // max(n_docs, 1)
+    term_offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(posting_terms, minlength=len(vocabulary)), out=term_offsets[1:])
+
+    product_ids = pd.to_numeric(df_reviews['product_id'], errors='coerce').fillna(-1).astype(np.int32).to_numpy()
+    brand_codes, brands = pd.factorize(df_reviews['brand_name'])
+
+    return ReviewIndex(
+        vocabulary,
+        term_offsets,
+        (pairs % max(n_docs, 1)).astype(np.int32),
+        term_freqs.astype(np.int32),
+        doc_lengths,
+        product_ids,
+        brand_codes.astype(np.int32),
+        np.asarray(brands, dtype='U'),
+    )
+
+
+def load_or_build(df_reviews, version):
+    path = os.path.join(CACHE_DIR, f'index-{version}.npz')
+    try:
+        index = ReviewIndex.load(path)
+        if len(index) == len(df_reviews):
+            return index
+    except (OSError, ValueError):
+        # Missing, or removed by another process pruning old versions
+        pass
+    index = build_index(df_reviews)
+    index.save(path)
+    # Indexes for older versions of the reviews are no longer reachable
+    for name in os.listdir(CACHE_DIR):
+        if name.endswith('.npz') and name != os.path.basename(path):
+            try:
+                os.remove(os.path.join(CACHE_DIR, name))
+            except OSError:
+                pass
+    return index
+
+
+class BackgroundIndex:
+    # Hands out the newest finished index together with the reviews frame it
+    # was built from (row positions refer to that frame). A newer version is
+    # built on a background thread meanwhile, so a search never waits for a
+    # rebuild once the first index exists; versions requested mid-build
+    # collapse into one follow-up build of the latest.
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._current = None  # (version, index, df_reviews)
+        self._pending = None  # (version, df_reviews)
+        self._requested = None
+        self._building = False
+        self._error = None
+
+    def get(self, version, df_reviews):
+        # Returns (index, df_reviews, up to date?); blocks only for the first build
+        with self._cond:
+            if version != self._requested:
+                self._requested = version
+                self._pending = (version, df_reviews)
+                self._error = None
+                if not self._building:
+                    self._building = True
+                    threading.Thread(target=self._run, daemon=True).start()
+            while self._current is None and self._error is None:
+                self._cond.wait()
+            if self._current is None:
+                raise self._error
+            current_version, index, indexed_reviews = self._current
+            return index, indexed_reviews, current_version == version
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._pending is None:
+                    self._building = False
+                    return
+                version, df_reviews = self._pending
+                self._pending = None
+            try:
+                index = load_or_build(df_reviews, version)
+            except Exception as e:
+                print(f'Review index build failed: {e}')
+                with self._cond:
+                    # Let the next request for this version try again
+                    if self._requested == version:
+                        self._requested = None
+                    self._error = e
+                    self._cond.notify_all()
+                continue
+            with self._cond:
+                self._current = (version, index, df_reviews)
+                self._cond.notify_all()
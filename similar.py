@@ -0,0 +1,182 @@
+import os
+import re
+import tempfile
+import zlib
+
+import numpy as np
+import pandas as pd
+
+import dataset
+
+# "Similar formulas" index: MinHash signatures over each product's ingredient
+# set, bucketed with banded LSH so a lookup only scores a handful of
+# candidates instead of every product in the catalog.
+#
+# Build offline with `python similar.py`; the dashboard only loads the result.
+
+INDEX_PATH = 'similar_index.npz'
+
+NUM_PERM = 128
+NUM_BANDS = 32  # 4 rows per band -> candidate threshold around Jaccard 0.42
+SEED = 1
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_EMPTY = np.iinfo(np.uint32).max
+
+# Values the scraper writes when a product page has no ingredient list
+_PLACEHOLDERS = {'', 'n/a', 'na', 'none', 'no information', 'nan'}
+
+
+def ingredient_sources():
+    # (source, csv file, id column, ingredients column) for every registered
+    # retailer that declares ingredient data. Missing files are skipped, so a
+    # retailer is picked up as soon as its CSV is added.
+    return [(name,) + adapter.ingredients for name, adapter in dataset.RETAILERS.items()
+            if adapter.ingredients is not None]
+
+
+def parse_ingredients(value):
+    # INCI lists arrive as plain comma-separated text (Credo) or as a
+    # stringified Python list (Sephora); normalise both to a set of names
+    if pd.isnull(value):
+        return set()
+    text = str(value).strip().lower()
+    if text in _PLACEHOLDERS:
+        return set()
+    text = text.strip('[]').replace("'", '').replace('"', '')
+    items = set()
+    for item in re.split(r'[,;]', text):
+        item = re.sub(r'[\*†‡]', '', item)
+        item = re.sub(r'\s+', ' ', item).strip(' .')
+        if item and item not in _PLACEHOLDERS:
+            items.add(item)
+    return items
+
+
+def _permutations(num_perm=NUM_PERM, seed=SEED):
+    gen = np.random.RandomState(seed)
+    a = gen.randint(1, np.iinfo(np.uint32).max, size=num_perm, dtype=np.uint64)
+    b = gen.randint(0, np.iinfo(np.uint32).max, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def minhash_signature(ingredients, perms):
+    a, b = perms
+    if not ingredients:
+        return np.full(len(a), _EMPTY, dtype=np.uint32)
+    # crc32 is stable across processes, unlike the built-in hash()
+    hv = np.array([zlib.crc32(item.encode('utf-8')) for item in ingredients], dtype=np.uint64)
+    phv = ((hv[:, None] * a[None, :] + b[None, :]) % _MERSENNE_PRIME) & _MAX_HASH
+    return phv.min(axis=0).astype(np.uint32)
+
+
+def _band_keys(signatures, num_bands):
+    # Collapse each band's rows into a single uint64 bucket key
+    n, num_perm = signatures.shape
+    rows = num_perm // num_bands
+    bands = signatures[:, :rows * num_bands].reshape(n, num_bands, rows).astype(np.uint64)
+    keys = np.zeros((n, num_bands), dtype=np.uint64)
+    for r in range(rows):
+        keys = keys * np.uint64(0x100000001B3) + bands[:, :, r]
+    return keys.T
+
+
+class SimilarIndex:
+    def __init__(self, sources, product_ids, signatures, band_keys, band_order):
+        self.sources = sources
+        self.product_ids = product_ids
+        self.signatures = signatures
+        # Per band: bucket keys sorted ascending and the row each one belongs to
+        self.band_keys = band_keys
+        self.band_order = band_order
+        self._row = {(s, p): i for i, (s, p) in enumerate(zip(sources, product_ids))}
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    def save(self, path=INDEX_PATH):
+        # Replace atomically; a running dashboard reloads as soon as the mtime changes
+        with tempfile.NamedTemporaryFile('wb', dir=os.path.dirname(os.path.abspath(path)),
+                                         suffix='.tmp', delete=False) as f:
+            np.savez_compressed(
+                f,
+                source=self.sources.astype('U'),
+                product_id=self.product_ids.astype('U'),
+                signature=self.signatures,
+                band_keys=self.band_keys,
+                band_order=self.band_order,
+            )
+        os.replace(f.name, path)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        with np.load(path) as data:
+            return cls(data['source'], data['product_id'], data['signature'],
+                       data['band_keys'], data['band_order'])
+
+    def similar(self, source, product_id, top_n=5, min_similarity=0.0):
+        # Returns [(source, product_id, estimated Jaccard)] best first
+        row = self._row.get((source, str(product_id)))
+        if row is None:
+            return []
+        sig = self.signatures[row]
+        if sig[0] == _EMPTY:
+            return []
+
+        query_keys = _band_keys(sig[None, :], self.band_keys.shape[0])[:, 0]
+        candidates = []
+        for band, key in enumerate(query_keys):
+            keys = self.band_keys[band]
+            lo = np.searchsorted(keys, key, side='left')
+            hi = np.searchsorted(keys, key, side='right')
+            if hi > lo:
+                candidates.append(self.band_order[band, lo:hi])
+        if not candidates:
+            return []
+        candidates = np.unique(np.concatenate(candidates))
+        candidates = candidates[candidates != row]
+        if len(candidates) == 0:
+            return []
+
+        scores = (self.signatures[candidates] == sig).mean(axis=1)
+        keep = scores >= min_similarity
+        candidates, scores = candidates[keep], scores[keep]
+        best = np.argsort(-scores, kind='stable')[:top_n]
+        return [(str(self.sources[i]), str(self.product_ids[i]), float(s))
+                for i, s in zip(candidates[best], scores[best])]
+
+
+def build_index(sources=None, num_perm=NUM_PERM, num_bands=NUM_BANDS):
+    if sources is None:
+        sources = ingredient_sources()
+    perms = _permutations(num_perm)
+    source_col, id_col, sig_rows = [], [], []
+    for source, path, id_column, ingredients_column in sources:
+        if not os.path.exists(path):
+            print(f'Skipping {source}: {path} not found')
+            continue
+        df = pd.read_csv(path, usecols=[id_column, ingredients_column])
+        for product_id, value in zip(df[id_column], df[ingredients_column]):
+            ingredients = parse_ingredients(value)
+            if not ingredients:
+                continue
+            source_col.append(source)
+            id_col.append(str(product_id))
+            sig_rows.append(minhash_signature(ingredients, perms))
+
+    if sig_rows:
+        signatures = np.vstack(sig_rows)
+    else:
+        signatures = np.empty((0, num_perm), dtype=np.uint32)
+    keys = _band_keys(signatures, num_bands)
+    order = np.argsort(keys, axis=1, kind='stable').astype(np.int32)
+    keys = np.take_along_axis(keys, order, axis=1)
+    return SimilarIndex(np.array(source_col, dtype='U'), np.array(id_col, dtype='U'),
+                        signatures, keys, order)
+
+
+if __name__ == '__main__':
+    index = build_index()
+    index.save(INDEX_PATH)
+    print(f'Indexed {len(index)} products into {INDEX_PATH}')
@@ -0,0 +1,125 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from email.utils import formatdate
+
+import pytest
+
+pytest.importorskip('pandas')
+
+import api
+import dataset
+
+
+class _Headers(dict):
+    def get(self, name, default=None):
+        return super().get(name, default)
+
+
+def test_not_modified_by_etag():
+    assert api._not_modified(_Headers({'If-None-Match': '"v1"'}), '"v1"', 1000)
+    assert api._not_modified(_Headers({'If-None-Match': '"v0", W/"v1"'}), '"v1"', 1000)
+    assert api._not_modified(_Headers({'If-None-Match': '*'}), '"v1"', 1000)
+    assert not api._not_modified(_Headers({'If-None-Match': '"v0"'}), '"v1"', 1000)
+
+
+def test_not_modified_by_date():
+    assert api._not_modified(_Headers({'If-Modified-Since': formatdate(1000, usegmt=True)}), '"v1"', 1000.5)
+    assert not api._not_modified(_Headers({'If-Modified-Since': formatdate(999, usegmt=True)}), '"v1"', 1000)
+    assert not api._not_modified(_Headers({'If-Modified-Since': 'garbage'}), '"v1"', 1000)
+    # If-None-Match wins over the date when both are sent
+    headers = _Headers({'If-None-Match': '"v0"', 'If-Modified-Since': formatdate(2000, usegmt=True)})
+    assert not api._not_modified(headers, '"v1"', 1000)
+    assert not api._not_modified(_Headers(), '"v1"', 1000)
+
+
+class _Snapshot:
+    def __init__(self, version):
+        self.version = version
+
+
+class _Store:
+    def __init__(self):
+        self.snapshot = _Snapshot('v1')
+        self.refreshes = 0
+
+    def refresh(self):
+        self.refreshes += 1
+
+
+def test_get_caches_bodies_per_version(monkeypatch):
+    builds = []
+
+    def build(self, snapshot, path):
+        builds.append((snapshot.version, path))
+        return None if path == '/missing' else f'{snapshot.version}{path}'.encode()
+
+    monkeypatch.setattr(api.MetricsAPI, '_build', build)
+    store = _Store()
+    metrics_api = api.MetricsAPI(store, refresh_interval=0)
+
+    assert metrics_api.get('/api/brands') == (store.snapshot, b'v1/api/brands')
+    assert metrics_api.get('/api/brands')[1] == b'v1/api/brands'
+    assert metrics_api.get('/missing')[1] is None
+    assert metrics_api.get('/missing')[1] is None
+    assert builds == [('v1', '/api/brands'), ('v1', '/missing'), ('v1', '/missing')]
+
+    store.snapshot = _Snapshot('v2')
+    snapshot, body = metrics_api.get('/api/brands')
+    assert snapshot.version == 'v2' and body == b'v2/api/brands'
+
+
+def test_refresh_is_throttled(monkeypatch):
+    monkeypatch.setattr(api.MetricsAPI, '_build', lambda self, snapshot, path: b'{}')
+    store = _Store()
+    metrics_api = api.MetricsAPI(store, refresh_interval=60)
+    for _ in range(10):
+        metrics_api.get('/api/overview')
+    assert store.refreshes == 1
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    products = tmp_path / 'products.csv'
+    products.write_text('product_id,product_name,brand_name,price,rating,reviews\n'
+                        '1,Cream,Shared,$30.00,4.5,10\n2,Serum,Solo,$250.00,4.0,3\n')
+    competitor = tmp_path / 'competitor.csv'
+    competitor.write_text('product_id,product_name,brand_name,price,rating,reviews\n'
+                          'P1,Cream,Shared,32.0,4.2,100\n')
+    reviews = tmp_path / 'reviews.csv'
+    reviews.write_text('id,product_id,brand_name,rating,title,body\n1,1,Shared,5,ok,fine\n')
+    monkeypatch.setattr(dataset, 'RETAILERS', {})
+    dataset.register_retailer(dataset.RetailerAdapter('Credo', str(products), {}, '#d8e6f5'))
+    dataset.register_retailer(dataset.RetailerAdapter('Sephora', str(competitor), {}, '#f7d7d9'))
+    monkeypatch.setattr(dataset, 'REVIEWS_PATH', str(reviews))
+
+    httpd = api.make_server(dataset.DataStore(), port=0)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield 'http://127.0.0.1:%d' % httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _fetch(url, headers=None):
+    request = urllib.request.Request(url, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def test_conditional_requests(server):
+    status, headers, body = _fetch(server + '/api/brands')
+    assert status == 200
+    assert json.loads(body)['data'] == ['Shared']
+    etag, last_modified = headers['ETag'], headers['Last-Modified']
+
+    status, headers, body = _fetch(server + '/api/brands', {'If-None-Match': etag})
+    assert status == 304 and body == b'' and headers['ETag'] == etag
+    assert _fetch(server + '/api/brands', {'If-Modified-Since': last_modified})[0] == 304
+    assert _fetch(server + '/api/brands', {'If-None-Match': '"stale"'})[0] == 200
+
+    assert _fetch(server + '/api/brands/Solo')[0] == 404
+    assert _fetch(server + '/api/nope', {'If-None-Match': '*'})[0] == 404
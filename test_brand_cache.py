@@ -0,0 +1,103 @@
+import os
+import sys
+import threading
+import types
+
+import pytest
+
+pytest.importorskip('pandas')
+pytest.importorskip('plotly')
+
+import brand_cache
+
+
+def _write_catalogs(directory):
+    (directory / 'credo_finaldata.csv').write_text(
+        'id,name,price,rating,review_count,brand_name\n'
+        '1,Cream,$30.00,4.5,10,Shared\n'
+        '2,Serum,$250.00,4.0,3,Credo Only\n')
+    (directory / 'sephoraproduct_info.csv').write_text(
+        'product_id,product_name,brand_name,price_usd,rating,reviews\n'
+        'P1,Cream,Shared,32.0,4.2,100\n')
+
+
+def test_background_warm_up_never_runs_the_dashboard(tmp_path, monkeypatch):
+    # Inside `streamlit run tob.py`, __main__ is the dashboard script. The
+    # warm-up must not re-execute it (spawned pool workers would).
+    _write_catalogs(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    marker = tmp_path / 'dashboard-ran'
+    dashboard = tmp_path / 'dashboard.py'
+    dashboard.write_text(f'open({str(marker)!r}, "w").close()\n')
+    fake_main = types.ModuleType('__main__')
+    fake_main.__file__ = str(dashboard)
+    monkeypatch.setitem(sys.modules, '__main__', fake_main)
+
+    done = threading.Event()
+    run_cli = brand_cache._run_cli
+
+    def run_and_signal(workers):
+        try:
+            return run_cli(workers)
+        finally:
+            done.set()
+
+    monkeypatch.setattr(brand_cache, '_run_cli', run_and_signal)
+    brand_cache._BackgroundWarmer(workers=2, debounce=0).request()
+    assert done.wait(120)
+
+    version_dirs = os.listdir(tmp_path / '.cache' / 'brands')
+    assert len(version_dirs) == 1
+    assert len(os.listdir(tmp_path / '.cache' / 'brands' / version_dirs[0])) == 1
+    assert not marker.exists()
+
+
+def test_requests_during_a_run_collapse_into_one(monkeypatch):
+    started = threading.Semaphore(0)
+    release = threading.Event()
+    runs = []
+
+    def fake_run(workers):
+        runs.append(workers)
+        started.release()
+        release.wait(10)
+        return 0
+
+    monkeypatch.setattr(brand_cache, '_run_cli', fake_run)
+    warmer = brand_cache._BackgroundWarmer(workers=None, debounce=0)
+    warmer.request()
+    assert started.acquire(timeout=10)
+    for _ in range(5):
+        warmer.request()
+    release.set()
+    assert started.acquire(timeout=10)
+    assert not started.acquire(timeout=0.5)
+    assert len(runs) == 2
+
+
+def test_prune_keeps_recent_versions(tmp_path, monkeypatch):
+    monkeypatch.setattr(brand_cache, 'CACHE_DIR', str(tmp_path))
+    for name in ['current', 'lagging', 'old']:
+        (tmp_path / name).mkdir()
+    os.utime(tmp_path / 'old', (0, 0))
+    brand_cache._prune('current')
+    assert sorted(os.listdir(tmp_path)) == ['current', 'lagging']
+
+
+def test_write_survives_directory_pruned_mid_write(tmp_path, monkeypatch):
+    monkeypatch.setattr(brand_cache, 'CACHE_DIR', str(tmp_path))
+    named_temporary_file = brand_cache.tempfile.NamedTemporaryFile
+    calls = []
+
+    def pruned_once(*args, **kwargs):
+        calls.append(kwargs['dir'])
+        if len(calls) == 1:
+            os.rmdir(kwargs['dir'])
+            raise FileNotFoundError(kwargs['dir'])
+        return named_temporary_file(*args, **kwargs)
+
+    monkeypatch.setattr(brand_cache.tempfile, 'NamedTemporaryFile', pruned_once)
+    entry = {'format': brand_cache.ENTRY_FORMAT, 'brand': 'Shared'}
+    assert brand_cache.write('v1', 'Shared', entry)
+    assert len(calls) == 2
+    assert brand_cache.read('v1', 'Shared') == entry
@@ -0,0 +1,162 @@
+import os
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+
+import dataset
+
+
+class _Clock:
+    # Explicit mtimes, so tests don't depend on filesystem timestamp resolution
+    def __init__(self):
+        self.ns = 1_700_000_000 * 10**9
+
+    def write(self, path, data, mode='wb'):
+        with open(path, mode) as f:
+            f.write(data)
+        self.ns += 10**9
+        os.utime(path, ns=(self.ns, self.ns))
+
+
+@pytest.fixture
+def clock():
+    return _Clock()
+
+
+def _tail(path):
+    return dataset._Tail(str(path), lambda df: df)
+
+
+def test_append_folds_in_new_rows(tmp_path, clock):
+    path = tmp_path / 'products.csv'
+    clock.write(path, b'id,name\n1,a\n2,b\n')
+    tail = _tail(path)
+    assert list(tail.full_read()['id']) == [1, 2]
+
+    clock.write(path, b'3,c\n4,d\n', 'ab')
+    rows, drop, rewritten = tail.read_appended()
+    assert not rewritten and drop == 0
+    assert list(rows['name']) == ['c', 'd']
+
+    assert tail.read_appended() == (None, 0, False)
+
+
+def test_partial_row_waits_for_newline(tmp_path, clock):
+    path = tmp_path / 'products.csv'
+    clock.write(path, b'id,name\n1,a\n')
+    tail = _tail(path)
+    tail.full_read()
+
+    # Half written, and already the right number of fields
+    clock.write(path, b'2,trunc', 'ab')
+    assert tail.read_appended() == (None, 0, False)
+
+    clock.write(path, b'ated\n', 'ab')
+    rows, drop, rewritten = tail.read_appended()
+    assert not rewritten and drop == 0
+    assert list(rows['name']) == ['truncated']
+
+
+def test_unterminated_last_row(tmp_path, clock):
+    path = tmp_path / 'products.csv'
+    clock.write(path, b'id,name\n1,a\n2,b')
+    tail = _tail(path)
+    assert list(tail.full_read()['name']) == ['a', 'b']
+
+    # Appender terminates the existing row first: nothing re-read
+    clock.write(path, b'\n3,c\n', 'ab')
+    rows, drop, _ = tail.read_appended()
+    assert drop == 0 and list(rows['name']) == ['c']
+
+
+def test_extended_last_row_is_reread(tmp_path, clock):
+    path = tmp_path / 'products.csv'
+    clock.write(path, b'id,name\n1,a\n2,b')
+    tail = _tail(path)
+    tail.full_read()
+
+    clock.write(path, b'cd\n3,e\n', 'ab')
+    rows, drop, rewritten = tail.read_appended()
+    assert not rewritten and drop == 1
+    assert list(rows['name']) == ['bcd', 'e']
+
+
+def test_quoted_newline_is_not_a_record_boundary(tmp_path, clock):
+    path = tmp_path / 'reviews.csv'
+    clock.write(path, b'id,body\n1,fine\n')
+    tail = _tail(path)
+    tail.full_read()
+
+    clock.write(path, b'2,"line one\nline', 'ab')
+    assert tail.read_appended() == (None, 0, False)
+
+    clock.write(path, b' two"\n', 'ab')
+    rows, _, _ = tail.read_appended()
+    assert list(rows['body']) == ['line one\nline two']
+
+
+def test_same_size_rewrite_forces_reload(tmp_path, clock):
+    path = tmp_path / 'products.csv'
+    clock.write(path, b'id,name\n' + b''.join(b'%d,row%04d\n' % (i, i) for i in range(2000)))
+    tail = _tail(path)
+    tail.full_read()
+
+    # Change a row in the middle, outside both fingerprinted windows
+    data = path.read_bytes().replace(b'1000,row1000', b'1000,ROW1000')
+    clock.write(path, data)
+    assert tail.read_appended() == (None, 0, True)
+
+
+def test_truncation_forces_reload(tmp_path, clock):
+    path = tmp_path / 'products.csv'
+    clock.write(path, b'id,name\n1,a\n2,b\n')
+    tail = _tail(path)
+    tail.full_read()
+
+    clock.write(path, b'id,name\n1,a\n')
+    assert tail.read_appended() == (None, 0, True)
+
+
+def test_refresh_keeps_frames_when_reload_fails(tmp_path, clock, monkeypatch, caplog):
+    products = tmp_path / 'products.csv'
+    reviews = tmp_path / 'reviews.csv'
+    clock.write(products, b'product_id,product_name,brand_name,price,rating,reviews\n1,a,B,$10.00,4.5,3\n')
+    clock.write(reviews, b'id,product_id,brand_name,rating,title,body\n1,1,B,5,ok,"fine"\n')
+    monkeypatch.setattr(dataset, 'RETAILERS', {})
+    dataset.register_retailer(dataset.RetailerAdapter('Credo', str(products), {}, '#d8e6f5'))
+    monkeypatch.setattr(dataset, 'REVIEWS_PATH', str(reviews))
+
+    store = dataset.DataStore()
+    version = store.reviews_version
+
+    # Rewritten by a writer still inside a quoted multi-line body
+    clock.write(reviews, b'id,product_id,brand_name,rating,title,body\n1,1,B,5,ok,"fine\nand')
+    with caplog.at_level('WARNING', logger='dataset'):
+        assert store.refresh() == []
+    assert 'deferred' in caplog.text
+    assert list(store.df_reviews['body']) == ['fine']
+    assert store.reviews_version == version
+
+    clock.write(reviews, b' more"\n', 'ab')
+    assert store.refresh() == ['reviews']
+    assert list(store.df_reviews['body']) == ['fine\nand more']
+
+
+def test_late_registration_keeps_source_coding(tmp_path, clock, monkeypatch):
+    products = tmp_path / 'products.csv'
+    reviews = tmp_path / 'reviews.csv'
+    clock.write(products, b'product_id,product_name,brand_name,price,rating,reviews\n1,a,B,$10.00,4.5,3\n')
+    clock.write(reviews, b'id,product_id,brand_name,rating,title,body\n1,1,B,5,ok,fine\n')
+    monkeypatch.setattr(dataset, 'RETAILERS', {})
+    dataset.register_retailer(dataset.RetailerAdapter('Credo', str(products), {}, '#d8e6f5'))
+    monkeypatch.setattr(dataset, 'REVIEWS_PATH', str(reviews))
+    store = dataset.DataStore()
+
+    dataset.register_retailer(dataset.RetailerAdapter('Later', str(tmp_path / 'later.csv'), {}, '#ffffff'))
+    clock.write(products, b'2,b,B,$12.00,4.0,1\n', 'ab')
+    assert store.refresh() == ['Credo']
+    source = store.df_combined['source']
+    assert isinstance(source.dtype, pd.CategoricalDtype)
+    assert list(source.cat.categories) == ['Credo']
+    assert list(source.cat.codes) == [0, 0]
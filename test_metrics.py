@@ -0,0 +1,39 @@
+import warnings
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+pytest.importorskip('plotly')
+
+import dataset
+import metrics
+
+
+@pytest.fixture
+def three_retailers(monkeypatch):
+    monkeypatch.setattr(dataset, 'RETAILERS', {})
+    for name in ['Credo', 'Sephora', 'Ulta']:
+        dataset.register_retailer(dataset.RetailerAdapter(name, f'{name}.csv', {}, '#ffffff'))
+    categories = list(dataset.RETAILERS)
+    rows = [('Credo', 'Shared', 30.0, 4.5), ('Sephora', 'Shared', 34.0, 4.0), ('Ulta', 'Other', 12.0, 3.0)]
+    return pd.DataFrame({
+        'source': pd.Categorical([r[0] for r in rows], categories=categories),
+        'brand_name': [r[1] for r in rows],
+        'price': [r[2] for r in rows],
+        'rating': [r[3] for r in rows],
+    })
+
+
+def test_brand_metrics_skips_retailers_without_the_brand(three_retailers):
+    assert metrics.brand_metrics(three_retailers, 'Shared') == {
+        'Credo': {'avg_price': 30.0, 'avg_rating': 4.5},
+        'Sephora': {'avg_price': 34.0, 'avg_rating': 4.0},
+    }
+
+
+def test_distributions_do_not_warn(three_retailers):
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        dist = metrics.rating_distribution(three_retailers)
+        metrics.price_distribution(three_retailers, [0, 25, 50, 100, 200, 300])
+    assert dist.groupby('source', observed=True)['percent'].sum().round(6).tolist() == [100.0, 100.0, 100.0]
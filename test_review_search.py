@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+
+import review_search
+
+
+def _reviews(rows):
+    return pd.DataFrame(rows, columns=['product_id', 'brand_name', 'title', 'body'])
+
+
+def test_background_index_serves_previous_version_while_building(tmp_path, monkeypatch):
+    monkeypatch.setattr(review_search, 'CACHE_DIR', str(tmp_path))
+    first = _reviews([(1, 'A', 'great', 'lovely cream')])
+    second = _reviews([(1, 'A', 'great', 'lovely cream'), (2, 'B', 'meh', 'sticky serum')])
+    builder = review_search.BackgroundIndex()
+    index, df, current = builder.get('v1', first)
+    assert current and df is first and len(index) == 1
+
+    release = threading.Event()
+    build_index = review_search.build_index
+
+    def slow_build(df_reviews):
+        release.wait(10)
+        return build_index(df_reviews)
+
+    monkeypatch.setattr(review_search, 'build_index', slow_build)
+    index, df, current = builder.get('v2', second)
+    assert not current and df is first and len(index) == 1
+
+    release.set()
+    for _ in range(100):
+        index, df, current = builder.get('v2', second)
+        if current:
+            break
+        threading.Event().wait(0.05)
+    assert current and df is second and len(index) == 2
+
+
+def test_save_leaves_no_temp_files(tmp_path):
+    df = _reviews([(1, 'A', 'great', 'lovely cream')])
+    path = str(tmp_path / 'index-v1.npz')
+    review_search.build_index(df).save(path)
+    review_search.build_index(df).save(path)
+    assert [p.name for p in tmp_path.iterdir()] == ['index-v1.npz']
+    assert len(review_search.ReviewIndex.load(path)) == 1
+
+
+@pytest.fixture
+def index():
+    return review_search.build_index(_reviews([
+        (1, 'A', 'Breakout city', 'This cream gave me a breakout'),
+        (1, 'A', 'Love it', 'Soft skin, no breakout at all, long lasting'),
+        (2, 'B', 'Broke me out', 'Instant breakout breakout breakout'),
+        (3, 'B', 'Fine', 'Long lasting scent'),
+    ]))
+
+
+def test_bm25_ranks_by_term_frequency_and_length(index):
+    rows, scores = index.search('breakout')
+    assert list(rows) == [2, 0, 1]
+    assert list(scores) == sorted(scores, reverse=True)
+
+
+def test_rare_terms_outweigh_common_ones(index):
+    # 'breakout' is in three of four reviews; one mention of the rarer terms beats three of it
+    rows, _ = index.search('long lasting breakout')
+    assert set(rows[:2]) == {1, 3}
+    assert list(rows[2:]) == [2, 0]
+
+
+def test_filters_restrict_results(index):
+    assert list(index.search('breakout', brand='A')[0]) == [0, 1]
+    assert list(index.search('breakout', product_id=2)[0]) == [2]
+    assert list(index.search('breakout', brand='B', product_id=1)[0]) == []
+    assert len(index.search('breakout', brand='Unknown')[0]) == 0
+
+
+def test_unknown_terms_and_top_n(index):
+    assert len(index.search('zzz')[0]) == 0
+    rows, _ = index.search('breakout', top_n=1)
+    assert list(rows) == [2]
@@ -0,0 +1,56 @@
+import pytest
+
+pytest.importorskip('pandas')
+
+import similar
+
+
+def _build(tmp_path, rows):
+    path = tmp_path / 'ingredients.csv'
+    path.write_text('id,ingredients\n' + ''.join(f'{pid},"{ingredients}"\n' for pid, ingredients in rows))
+    return similar.build_index([('Credo', str(path), 'id', 'ingredients')])
+
+
+BASE = ', '.join(f'ingredient {i}' for i in range(20))
+
+
+def test_parse_ingredients_handles_both_formats():
+    assert similar.parse_ingredients('Water, Glycerin*, Aloe Vera.') == {'water', 'glycerin', 'aloe vera'}
+    assert similar.parse_ingredients("['Water', 'Glycerin']") == {'water', 'glycerin'}
+    assert similar.parse_ingredients('No Information') == set()
+    assert similar.parse_ingredients(float('nan')) == set()
+
+
+def test_similar_ranks_near_duplicates_first(tmp_path):
+    index = _build(tmp_path, [
+        (1, BASE),
+        (2, BASE + ', extra'),
+        (3, ', '.join(f'ingredient {i}' for i in range(12)) + ', other a, other b'),
+        (4, 'unrelated a, unrelated b, unrelated c'),
+        (5, 'n/a'),
+    ])
+    # The product without an ingredient list isn't indexed
+    assert len(index) == 4
+
+    matches = index.similar('Credo', 1, top_n=5)
+    assert [pid for _, pid, _ in matches][:2] == ['2', '3']
+    assert matches[0][2] > 0.8 and matches[0][2] > matches[1][2]
+    assert all(pid not in ('1', '4') for _, pid, _ in matches)
+
+    assert [pid for _, pid, _ in index.similar('Credo', 1, min_similarity=0.9)] == ['2']
+    assert index.similar('Credo', 1, top_n=1) == matches[:1]
+
+
+def test_unknown_product_has_no_matches(tmp_path):
+    index = _build(tmp_path, [(1, BASE), (2, BASE)])
+    assert index.similar('Credo', 99) == []
+    assert index.similar('Sephora', 1) == []
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = _build(tmp_path, [(1, BASE), (2, BASE + ', extra'), (3, 'unrelated a, unrelated b')])
+    path = str(tmp_path / 'index.npz')
+    index.save(path)
+    loaded = similar.SimilarIndex.load(path)
+    assert loaded.similar('Credo', 1) == index.similar('Credo', 1)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['index.npz', 'ingredients.csv']
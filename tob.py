@@ -1,219 +1,144 @@
 import pandas as pd
 import streamlit as st
 import plotly.express as px
-import re
+import plotly.io as pio
+import html
+import os
 import random
+import time
 
-# Load data
+import api
+import brand_cache
+import dataset
+import metrics
+import review_search
+from similar import INDEX_PATH, SimilarIndex
+
+# Load data once per server; later runs only fold in rows appended to the CSVs
 @st.cache_resource
-def load_data():
-    # Load datasets
-    df_credo = pd.read_csv('credo_finaldata.csv')
-    df_sephora = pd.read_csv('sephoraproduct_info.csv')
-    
-    # Clean and standardize columns for Credo
-    df_credo.rename(columns={
-        'id': 'product_id',
-        'name': 'product_name',
-        'price': 'price',
-        'rating': 'rating',
-        'review_count': 'reviews',
-        'brand_name': 'brand_name'
-    }, inplace=True)
-    
-    # Clean and standardize columns for Sephora
-    df_sephora.rename(columns={
-        'product_id': 'product_id',
-        'product_name': 'product_name',
-        'brand_name': 'brand_name',
-        'price_usd': 'price',
-        'rating': 'rating',
-        'reviews': 'reviews'
-    }, inplace=True)
-    
-    # Define price extraction function
-    def extract_price(price_str):
-        if pd.isnull(price_str):
-            return None
-        match = re.findall(r'[\d\.]+', str(price_str))
-        if match:
-            return float(match[0])
-        else:
-            return None
-    
-    # Apply price extraction
-    df_credo['price'] = df_credo['price'].apply(extract_price)
-    df_sephora['price'] = df_sephora['price'].apply(extract_price)
-    
-    # Drop rows with invalid prices
-    df_credo = df_credo.dropna(subset=['price'])
-    df_sephora = df_sephora.dropna(subset=['price'])
-    
-    # Convert ratings and reviews to numeric
-    df_credo['rating'] = pd.to_numeric(df_credo['rating'], errors='coerce')
-    df_sephora['rating'] = pd.to_numeric(df_sephora['rating'], errors='coerce')
-    
-    df_credo['reviews'] = pd.to_numeric(df_credo['reviews'], errors='coerce')
-    df_sephora['reviews'] = pd.to_numeric(df_sephora['reviews'], errors='coerce')
-    
-    # Add source column
-    df_credo['source'] = 'Credo'
-    df_sephora['source'] = 'Sephora'
-    
-    # Combine datasets
-    df_combined = pd.concat([df_credo, df_sephora], ignore_index=True)
-    
-    return df_credo, df_sephora, df_combined
+def load_store():
+    return dataset.DataStore()
+
+# Serve the same cached dataset as a read-only JSON API (see api.py)
+@st.cache_resource
+def start_metrics_api(_store):
+    return api.serve_in_background(_store)
+
+# Precompute every brand drilldown into the shared on-disk cache when the data version changes
+@st.cache_resource(max_entries=1)
+def start_brand_warm_up(version):
+    brand_cache.request_background_warm_up()
+
+# Review search index, rebuilt in the background when the reviews change
+@st.cache_resource
+def review_index_builder():
+    return review_search.BackgroundIndex()
+
+# Load the "similar formulas" index built offline by `python similar.py`;
+# keyed on the file's mtime so a rebuild is picked up without a restart
+@st.cache_resource(max_entries=1)
+def load_similar_index(mtime):
+    if mtime is None:
+        return None
+    return SimilarIndex.load(INDEX_PATH)
+
+def similar_index_mtime():
+    try:
+        return os.path.getmtime(INDEX_PATH)
+    except OSError:
+        return None
 
 # Load data
-df_credo, df_sephora, df_combined = load_data()
+store = load_store()
+store.refresh()
+# One consistent view for this run; the frames are shared, so never modify them in place
+snapshot = store.snapshot
+df_credo, df_combined = snapshot.df_credo, snapshot.df_combined
+retailer_colors = metrics.source_colors()
+data_version = snapshot.version
+start_metrics_api(store)
+start_brand_warm_up(data_version)
 
 # Sidebar for page selection
 st.sidebar.title("Navigation")
-page = st.sidebar.selectbox("Choose a Page", ["Overview Metrics", "Product Showcase"])
+pages = ["Overview Metrics", "Product Showcase", "Review Search"]
+# Search results link to showcase cards via ?page=...&product_id=...
+requested_page = st.query_params.get("page")
+page = st.sidebar.selectbox(
+    "Choose a Page", pages,
+    index=pages.index(requested_page) if requested_page in pages else 0
+)
 
 ### Overview Metrics Page
 if page == "Overview Metrics":
-    st.title("Credo Beauty vs. Sephora: Competitive Analysis")
+    competitors = [name for name in snapshot.frames if name != dataset.HOME_RETAILER]
+    st.title("Credo Beauty vs. {}: Competitive Analysis".format(", ".join(competitors)))
     
     # Compute metrics
-    num_brands_credo = df_credo['brand_name'].nunique()
-    num_brands_sephora = df_sephora['brand_name'].nunique()
-    
-    num_products_credo = df_credo['product_id'].nunique()
-    num_products_sephora = df_sephora['product_id'].nunique()
-    
-    avg_price_credo = df_credo['price'].mean()
-    avg_price_sephora = df_sephora['price'].mean()
-    
-    median_price_credo = df_credo['price'].median()
-    median_price_sephora = df_sephora['price'].median()
-    
-    avg_rating_credo = df_credo['rating'].mean()
-    avg_rating_sephora = df_sephora['rating'].mean()
-    
-    median_rating_credo = df_credo['rating'].median()
-    median_rating_sephora = df_sephora['rating'].median()
-    
-    avg_reviews_credo = df_credo['reviews'].mean()
-    avg_reviews_sephora = df_sephora['reviews'].mean()
-    
-    price_min_credo = df_credo['price'].min()
-    price_max_credo = df_credo['price'].max()
-    
-    price_min_sephora = df_sephora['price'].min()
-    price_max_sephora = df_sephora['price'].max()
+    overviews = {name: metrics.source_overview(df) for name, df in snapshot.frames.items()}
+    
+    # One column per retailer, in registry order
+    def retailer_cards(template, fields):
+        for col, (name, overview) in zip(st.columns(len(overviews)), overviews.items()):
+            with col:
+                st.markdown(
+                    """
+                    <div style="background-color:{}; padding:15px; border-radius:10px;">
+                        <h4>{}</h4>
+                        {}
+                    </div>
+                    """.format(retailer_colors[name], name, template.format(*[overview[f] for f in fields])),
+                    unsafe_allow_html=True
+                )
     
     # Overview Metrics
     st.header('Overview Metrics')
     
-    # Create columns for Credo and Sephora
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        st.markdown(
-            """
-            <div style="background-color:#d8e6f5; padding:15px; border-radius:10px;">
-                <h4>Credo</h4>
-                <p><strong>Number of Brands:</strong> {}</p>
-                <p><strong>Number of Products:</strong> {}</p>
-            </div>
-            """.format(num_brands_credo, num_products_credo),
-            unsafe_allow_html=True
-        )
-    
-    with col2:
-        st.markdown(
-            """
-            <div style="background-color:#f7d7d9; padding:15px; border-radius:10px;">
-                <h4>Sephora</h4>
-                <p><strong>Number of Brands:</strong> {}</p>
-                <p><strong>Number of Products:</strong> {}</p>
-            </div>
-            """.format(num_brands_sephora, num_products_sephora),
-            unsafe_allow_html=True
-        )
+    retailer_cards(
+        """
+        <p><strong>Number of Brands:</strong> {}</p>
+        <p><strong>Number of Products:</strong> {}</p>
+        """,
+        ['num_brands', 'num_products']
+    )
     
     # Price Metrics
     st.subheader('Price Metrics')
     
-    col3, col4 = st.columns(2)
-    
-    with col3:
-        st.markdown(
-            """
-            <div style="background-color:#d8e6f5; padding:15px; border-radius:10px;">
-                <h4>Credo</h4>
-                <p><strong>Average Price:</strong> ${:.2f}</p>
-                <p><strong>Median Price:</strong> ${:.2f}</p>
-                <p><strong>Price Range:</strong> ${:.2f} - ${:.2f}</p>
-            </div>
-            """.format(avg_price_credo, median_price_credo, price_min_credo, price_max_credo),
-            unsafe_allow_html=True
-        )
-    
-    with col4:
-        st.markdown(
-            """
-            <div style="background-color:#f7d7d9; padding:15px; border-radius:10px;">
-                <h4>Sephora</h4>
-                <p><strong>Average Price:</strong> ${:.2f}</p>
-                <p><strong>Median Price:</strong> ${:.2f}</p>
-                <p><strong>Price Range:</strong> ${:.2f} - ${:.2f}</p>
-            </div>
-            """.format(avg_price_sephora, median_price_sephora, price_min_sephora, price_max_sephora),
-            unsafe_allow_html=True
-        )
+    retailer_cards(
+        """
+        <p><strong>Average Price:</strong> ${:.2f}</p>
+        <p><strong>Median Price:</strong> ${:.2f}</p>
+        <p><strong>Price Range:</strong> ${:.2f} - ${:.2f}</p>
+        """,
+        ['avg_price', 'median_price', 'min_price', 'max_price']
+    )
     
     # Rating Metrics
     st.subheader('Rating Metrics')
     
-    col5, col6 = st.columns(2)
-    
-    with col5:
-        st.markdown(
-            """
-            <div style="background-color:#d8e6f5; padding:15px; border-radius:10px;">
-                <h4>Credo</h4>
-                <p><strong>Average Rating:</strong> {:.2f}</p>
-                <p><strong>Median Rating:</strong> {:.2f}</p>
-                <p><strong>Average Review Count:</strong> {:.0f}</p>
-            </div>
-            """.format(avg_rating_credo, median_rating_credo, avg_reviews_credo),
-            unsafe_allow_html=True
-        )
-    
-    with col6:
-        st.markdown(
-            """
-            <div style="background-color:#f7d7d9; padding:15px; border-radius:10px;">
-                <h4>Sephora</h4>
-                <p><strong>Average Rating:</strong> {:.2f}</p>
-                <p><strong>Median Rating:</strong> {:.2f}</p>
-                <p><strong>Average Review Count:</strong> {:.0f}</p>
-            </div>
-            """.format(avg_rating_sephora, median_rating_sephora, avg_reviews_sephora),
-            unsafe_allow_html=True
-        )
+    retailer_cards(
+        """
+        <p><strong>Average Rating:</strong> {:.2f}</p>
+        <p><strong>Median Rating:</strong> {:.2f}</p>
+        <p><strong>Average Review Count:</strong> {:.0f}</p>
+        """,
+        ['avg_rating', 'median_rating', 'avg_reviews']
+    )
     
     # Price Distribution
     st.header('Price Distribution by Price Range')
     
-    price_bins = [0, 25, 50, 100, 200, df_combined['price'].max()]
-    price_labels = ['Budget ($0-25)', 'Low Price ($25-50)', 'Mid Price ($50-100)', 'High Price ($100-200)', 'Luxury ($200+)']
+    price_bins = metrics.price_bins(df_combined)
     
-    df_combined['price_bin'] = pd.cut(df_combined['price'], bins=price_bins, labels=price_labels, include_lowest=True)
-    
-    price_distribution = df_combined.groupby(['source', 'price_bin']).size().reset_index(name='count')
-    total_counts = price_distribution.groupby('source')['count'].transform('sum')
-    price_distribution['percent'] = price_distribution['count'] / total_counts * 100
+    price_distribution = metrics.price_distribution(df_combined, price_bins)
     
     fig_price_bar = px.bar(
         price_distribution,
         x='price_bin',
         y='percent',
         color='source',
-        color_discrete_map={'Credo': '#d8e6f5', 'Sephora': '#f7d7d9'},
+        color_discrete_map=retailer_colors,
         barmode='group',
         text=price_distribution['percent'].round(1),
         title='Price Distribution by Price Range',
@@ -225,21 +150,14 @@ if page == "Overview Metrics":
     # Rating Distribution
     st.header('Rating Distribution by Rating Range')
     
-    rating_bins = [0, 2, 3, 4, 5]
-    rating_labels = ['0-2', '2-3', '3-4', '4-5']
-    
-    df_combined['rating_bin'] = pd.cut(df_combined['rating'], bins=rating_bins, labels=rating_labels, include_lowest=True)
-    
-    rating_distribution = df_combined.groupby(['source', 'rating_bin']).size().reset_index(name='count')
-    total_counts_rating = rating_distribution.groupby('source')['count'].transform('sum')
-    rating_distribution['percent'] = rating_distribution['count'] / total_counts_rating * 100
+    rating_distribution = metrics.rating_distribution(df_combined)
     
     fig_rating_bar = px.bar(
         rating_distribution,
         x='rating_bin',
         y='percent',
         color='source',
-        color_discrete_map={'Credo': '#d8e6f5', 'Sephora': '#f7d7d9'},
+        color_discrete_map=retailer_colors,
         barmode='group',
         text=rating_distribution['percent'].round(1),
         title='Rating Distribution by Rating Range',
@@ -251,12 +169,16 @@ if page == "Overview Metrics":
     # Box Plot: Rating vs Price Range
     st.header('Rating Distribution Across Price Ranges')
     
+    # Bin a local copy; df_combined is shared with other sessions and the API
+    df_box = df_combined[['source', 'price', 'rating']].copy()
+    df_box['price_bin'] = pd.cut(df_box['price'], bins=price_bins, labels=metrics.PRICE_LABELS, include_lowest=True)
+    
     fig_box = px.box(
-        df_combined,
+        df_box,
         x='price_bin',
         y='rating',
         color='source',
-        color_discrete_map={'Credo': '#d8e6f5', 'Sephora': '#f7d7d9'},
+        color_discrete_map=retailer_colors,
         title='Rating Distribution Across Price Ranges',
         labels={'price_bin': 'Price Range', 'rating': 'Rating'}
     )
@@ -265,79 +187,38 @@ if page == "Overview Metrics":
     # Brand Comparison
     st.header('Select a Brand to Compare')
     
-    common_brands = set(df_credo['brand_name'].unique()).intersection(set(df_sephora['brand_name'].unique()))
-    common_brands = sorted(list(common_brands))
+    common_brands = metrics.common_brands(snapshot.frames)
     
     if common_brands:
         selected_brand = st.selectbox('Select a Brand', options=common_brands)
         
-        # Filter data for selected brand
-        df_brand = df_combined[df_combined['brand_name'] == selected_brand]
-        
-        # Split by source
-        df_brand_credo = df_brand[df_brand['source'] == 'Credo']
-        df_brand_sephora = df_brand[df_brand['source'] == 'Sephora']
-        
-        # Calculate metrics
-        avg_price_brand_credo = df_brand_credo['price'].mean()
-        avg_price_brand_sephora = df_brand_sephora['price'].mean()
-        
-        avg_rating_brand_credo = df_brand_credo['rating'].mean()
-        avg_rating_brand_sephora = df_brand_sephora['rating'].mean()
+        # Metrics and figure come from the shared brand cache (built on a miss)
+        brand_entry = brand_cache.get(data_version, df_combined, selected_brand, price_bins)
+        brand_metrics = brand_entry['metrics']
         
         # Display metrics
         st.subheader(f'Average Price and Rating for {selected_brand}')
         
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.markdown(
-                """
-                <div style="background-color:#d8e6f5; padding:15px; border-radius:10px;">
-                    <h4>Credo</h4>
-                    <p><strong>Average Price:</strong> ${:.2f}</p>
-                    <p><strong>Average Rating:</strong> {:.2f}</p>
-                </div>
-                """.format(avg_price_brand_credo, avg_rating_brand_credo),
-                unsafe_allow_html=True
-            )
-        
-        with col2:
-            st.markdown(
-                """
-                <div style="background-color:#f7d7d9; padding:15px; border-radius:10px;">
-                    <h4>Sephora</h4>
-                    <p><strong>Average Price:</strong> ${:.2f}</p>
-                    <p><strong>Average Rating:</strong> {:.2f}</p>
-                </div>
-                """.format(avg_price_brand_sephora, avg_rating_brand_sephora),
-                unsafe_allow_html=True
-            )
+        for col, (name, source_metrics) in zip(st.columns(len(brand_metrics)), brand_metrics.items()):
+            with col:
+                st.markdown(
+                    """
+                    <div style="background-color:{}; padding:15px; border-radius:10px;">
+                        <h4>{}</h4>
+                        <p><strong>Average Price:</strong> ${:.2f}</p>
+                        <p><strong>Average Rating:</strong> {:.2f}</p>
+                    </div>
+                    """.format(retailer_colors.get(name, '#e0e0e0'), name, source_metrics['avg_price'], source_metrics['avg_rating']),
+                    unsafe_allow_html=True
+                )
         
         # Price Distribution for selected brand
         st.subheader(f'Price Distribution for {selected_brand}')
         
-        df_brand['price_bin'] = pd.cut(df_brand['price'], bins=price_bins, labels=price_labels, include_lowest=True)
-        
-        brand_price_distribution = df_brand.groupby(['source', 'price_bin']).size().reset_index(name='count')
-        total_counts_brand_price = brand_price_distribution.groupby('source')['count'].transform('sum')
-        brand_price_distribution['percent'] = brand_price_distribution['count'] / total_counts_brand_price * 100
-        
-        fig_brand_price_bar = px.bar(
-            brand_price_distribution,
-            x='price_bin',
-            y='percent',
-            color='source',
-            color_discrete_map={'Credo': '#d8e6f5', 'Sephora': '#f7d7d9'},
-            barmode='group',
-            text=brand_price_distribution['percent'].round(1),
-            title=f'Price Distribution for {selected_brand}',
-            labels={'price_bin': 'Price Range', 'percent': 'Percentage (%)'}
-        )
-        fig_brand_price_bar.update_traces(textposition='outside')
+        fig_brand_price_bar = pio.from_json(brand_entry['figure'])
         st.plotly_chart(fig_brand_price_bar)
     else:
-        st.write('No common brands between Credo and Sephora.')
+        st.write('No brands shared between Credo and its competitors.')
 
 elif page == "Product Showcase":
     st.title("Product Showcase")
@@ -374,6 +255,12 @@ elif page == "Product Showcase":
 
     filtered_df = filtered_df.sample(frac=1, random_state=42)
 
+    # 从评论搜索跳转过来时只显示该产品
+    focus_product = st.query_params.get("product_id")
+    if focus_product:
+        filtered_df = df_credo[df_credo['product_id'].astype(str) == focus_product].copy()
+        st.markdown('<a href="?page=Product+Showcase" target="_self">Show all products</a>', unsafe_allow_html=True)
+
     # 替换 NaN 值
     numeric_fields = ['price', 'rating', 'reviews', 'sentiment']
     for field in numeric_fields:
@@ -400,6 +287,16 @@ elif page == "Product Showcase":
             ])
         return ""
 
+    # 相似配方索引和产品名称查找表
+    similar_index = load_similar_index(similar_index_mtime())
+    product_names = {
+        (source, str(product_id)): f"{brand}: {name}"
+        for source, product_id, brand, name in zip(
+            df_combined['source'], df_combined['product_id'],
+            df_combined['brand_name'], df_combined['product_name']
+        )
+    }
+
     # 遍历每个产品并展示
     for _, row in filtered_df.iterrows():
         # 确保字段存在并处理 NaN
@@ -419,6 +316,17 @@ elif page == "Product Showcase":
         ingredients_display = f"<p><strong>Ingredients:</strong> {format_display(ingredients)}</p>" if ingredients else ""
         sentiment_display = f"<p><strong>Sentiment:</strong> {sentiment}</p>" if sentiment else "sentiment,"
         review_display = f"<p><strong>Review:</strong> {first_sentence}</p>" if first_sentence else "review summary x available."
+
+        # 相似配方推荐
+        similar_display = ""
+        if similar_index is not None:
+            matches = similar_index.similar(dataset.HOME_RETAILER, row['product_id'], top_n=5, min_similarity=0.3)
+            similar_names = [product_names[(s, p)] for s, p, _ in matches if (s, p) in product_names]
+            if similar_names:
+                similar_display = "<p><strong>Similar formulas:</strong> {}</p>".format(" ".join([
+                    f'<span style="background-color:#e0e0e0; padding:2px 4px; border-radius:3px; margin-right:2px;">{name}</span>'
+                    for name in similar_names
+                ]))
         
         # 清理适用字段
         suitable_clean = suitable_type.strip("[]").replace("'", "").replace('"', "")
@@ -445,7 +353,7 @@ elif page == "Product Showcase":
     
         # 构建 HTML 内容
         html_content = f"""
-            <div style="{container_style}">
+            <div id="product-{row['product_id']}" style="{container_style}">
                 <div style="display: flex; align-items: center;">
                     <img src="{image_url}" width="150" style="border-radius:5px;">
                     <div style="margin-left:20px; flex: 1;">
@@ -458,6 +366,7 @@ elif page == "Product Showcase":
                         {ingredients_display}
                         {sentiment_display}
                         {review_display}
+                        {similar_display}
                     </div>
                 </div>
             </div>
@@ -467,4 +376,48 @@ elif page == "Product Showcase":
         # 渲染 HTML 内容（确保所有情况都用 unsafe_allow_html）
         st.markdown(html_content, unsafe_allow_html=True)
 
+elif page == "Review Search":
+    st.title("Review Search")
+
+    # Search the frame the index was built from; it may trail the latest reviews
+    review_index, df_reviews, index_current = review_index_builder().get(snapshot.reviews_version, snapshot.df_reviews)
+    if not index_current:
+        st.caption("New reviews are being indexed; results will include them shortly.")
+
+    query = st.text_input("Search reviews", placeholder='e.g. breakout, long lasting')
+
+    # 按品牌或产品缩小范围
+    brand_options = ["All brands"] + sorted(df_reviews['brand_name'].dropna().unique())
+    selected_review_brand = st.selectbox("Brand", options=brand_options)
+    df_brand_reviews = df_reviews if selected_review_brand == "All brands" else df_reviews[df_reviews['brand_name'] == selected_review_brand]
+    product_labels = {None: "All products"}
+    for product_id, brand_name, product_name in df_brand_reviews[['product_id', 'brand_name', 'product_name']].drop_duplicates('product_id').itertuples(index=False):
+        product_labels[product_id] = f"{brand_name}: {product_name}"
+    selected_review_product = st.selectbox("Product", options=list(product_labels), format_func=product_labels.get)
+
+    if query:
+        start = time.perf_counter()
+        rows, scores = review_index.search(
+            query,
+            brand=None if selected_review_brand == "All brands" else selected_review_brand,
+            product_id=selected_review_product,
+            top_n=20
+        )
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        st.caption(f"{len(rows)} results in {elapsed_ms:.1f} ms")
 
+        for row_position, score in zip(rows, scores):
+            review = df_reviews.iloc[row_position]
+            rating = review['rating'] if pd.notnull(review['rating']) else ''
+            showcase_link = f'?page=Product+Showcase&product_id={review["product_id"]}'
+            st.markdown(
+                f"""
+                <div style="border:1px solid #e0e0e0; padding:10px; border-radius:5px;">
+                    <h4 style="margin:0;"><a href="{showcase_link}" target="_self">{review['brand_name']}: {review['product_name']}</a></h4>
+                    <p><strong>{html.escape(review['title'])}</strong> ({rating}&#9733;, score {score:.2f})</p>
+                    <p>{html.escape(review['body'])}</p>
+                </div>
+                <br/>
+                """,
+                unsafe_allow_html=True
+            )